@@ -0,0 +1,306 @@
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, quote
+from wsgiref.simple_server import WSGIServer, make_server
+
+import requests
+from core.auth import login_and_get_session_token, SessionExpiredError
+from core.dashboard import get_semesters
+from core.classes import get_class_documents
+from core.doc import get_document_resource
+from core.downloader import (
+    get_filename_from_url, is_lms_file_url, open_file_stream,
+    iter_file_chunks, can_access_file, FileRedirectError,
+)
+from core.attendance import fetch_detailed_attendance, fetch_overall_attendance
+from core.cache import FileCache
+from core.governor import governor, get_governor_state, GovernorBusyError
+
+LOGIN_URL = "https://mydy.dypatil.edu/rait/login/index.php"
+MODTYPES = ("flexpaper", "dyquestion", "presentation", "url")
+MAX_BODY_BYTES = 16 * 1024
+# How long a request queues for an LMS slot before the API answers 503
+ACQUIRE_TIMEOUT = 15.0
+# Upstream statuses that describe the user's request rather than an LMS failure
+PASSTHROUGH_STATUSES = {403: "403 Forbidden", 404: "404 Not Found"}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class SessionStore:
+    """
+    Server-side map of API tokens to MoodleSession tokens.
+    Bounded in size; idle sessions expire and the least recently used is dropped when full.
+    """
+
+    def __init__(self, max_sessions=500, idle_timeout=2 * 60 * 60):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+
+    def create(self, moodle_token):
+        api_token = secrets.token_urlsafe(32)
+        with self._lock:
+            self._sessions[api_token] = (moodle_token, time.monotonic())
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return api_token
+
+    def get(self, api_token):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(api_token)
+            if entry is None:
+                return None
+            moodle_token, last_seen = entry
+            if now - last_seen > self.idle_timeout:
+                del self._sessions[api_token]
+                return None
+            self._sessions[api_token] = (moodle_token, now)
+            self._sessions.move_to_end(api_token)
+            return moodle_token
+
+    def remove(self, api_token):
+        with self._lock:
+            self._sessions.pop(api_token, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+sessions = SessionStore()
+governor.acquire_timeout = ACQUIRE_TIMEOUT
+file_cache = FileCache()
+
+
+def _json_response(start_response, status, payload, headers=()):
+    body = json.dumps(payload).encode("utf-8")
+    start_response(status, [
+        ("Content-Type", "application/json"),
+        ("Content-Length", str(len(body))),
+        *headers,
+    ])
+    return [body]
+
+
+def _read_json(environ):
+    try:
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        length = 0
+    if length < 0:
+        raise ApiError("400 Bad Request", "Invalid Content-Length.")
+    if length > MAX_BODY_BYTES:
+        raise ApiError("413 Payload Too Large", "Request body too large.")
+    raw = environ["wsgi.input"].read(length) if length else b""
+    try:
+        data = json.loads(raw or b"{}")
+    except ValueError:
+        raise ApiError("400 Bad Request", "Body must be JSON.")
+    if not isinstance(data, dict):
+        raise ApiError("400 Bad Request", "Body must be a JSON object.")
+    return data
+
+
+def _api_token(environ):
+    header = environ.get("HTTP_AUTHORIZATION", "")
+    if header.startswith("Bearer "):
+        return header[len("Bearer "):].strip()
+    return None
+
+
+def _require_session(environ):
+    moodle_token = sessions.get(_api_token(environ) or "")
+    if not moodle_token:
+        raise ApiError("401 Unauthorized", "Missing or expired session. Log in again.")
+    return moodle_token
+
+
+def _query(environ, name):
+    values = parse_qs(environ.get("QUERY_STRING", "")).get(name)
+    if not values:
+        raise ApiError("400 Bad Request", f"Missing query parameter: {name}")
+    return values[0]
+
+
+def login(environ):
+    data = _read_json(environ)
+    email, password = data.get("email"), data.get("password")
+    if not email or not password:
+        raise ApiError("400 Bad Request", "email and password are required.")
+    try:
+        moodle_token = login_and_get_session_token(email, password, LOGIN_URL)
+    except ValueError as e:
+        raise ApiError("401 Unauthorized", str(e))
+    except RuntimeError as e:
+        raise ApiError("502 Bad Gateway", str(e))
+    return {"token": sessions.create(moodle_token)}
+
+
+def logout(environ):
+    token = _api_token(environ)
+    if token:
+        sessions.remove(token)
+    return {"ok": True}
+
+
+def semesters(environ):
+    return get_semesters(_require_session(environ))
+
+
+def subject_documents(environ, subject_id):
+    return get_class_documents(_require_session(environ), subject_id)
+
+
+def resource(environ):
+    mod_type = _query(environ, "mod_type")
+    if mod_type not in MODTYPES:
+        raise ApiError("400 Bad Request", f"Unsupported mod_type: {mod_type}")
+    doc_id = _query(environ, "id")
+    url = get_document_resource(_require_session(environ), mod_type, doc_id)
+    if url is None:
+        raise ApiError("404 Not Found", "No resource found for this document.")
+    return {"url": url, "filename": get_filename_from_url(url)}
+
+
+def attendance(environ):
+    session_token = _require_session(environ)
+    return {
+        "overall": fetch_overall_attendance(session_token),
+        "detailed": fetch_detailed_attendance(session_token),
+    }
+
+
+def status(environ):
+    return {
+        "sessions": len(sessions),
+        "governor": get_governor_state(),
+        "file_cache": file_cache.stats(),
+    }
+
+
+def _cache_as_you_go(chunks, url, headers, expected_size):
+    # Streams to the client and keeps a copy only if the whole body fits the cache
+    keep = expected_size is not None and expected_size <= file_cache.max_item_bytes
+    parts = []
+    received = 0
+    for chunk in chunks:
+        received += len(chunk)
+        if keep:
+            parts.append(chunk)
+        yield chunk
+    if keep and received == expected_size:
+        file_cache.put(url, headers, b"".join(parts))
+
+
+def file_download(environ, start_response):
+    session_token = _require_session(environ)
+    url = _query(environ, "url")
+    if not is_lms_file_url(url):
+        raise ApiError("400 Bad Request", "Only LMS pluginfile.php URLs can be downloaded.")
+    filename = quote(get_filename_from_url(url))
+    disposition = f"attachment; filename*=UTF-8''{filename}"
+
+    cached = file_cache.get(url)
+    if cached and can_access_file(session_token, url):
+        headers, body = cached
+        start_response("200 OK", headers + [
+            ("Content-Length", str(len(body))),
+            ("Content-Disposition", disposition),
+        ])
+        return [body]
+
+    # The client sets the pace of the body, so it must not hold an LMS slot meanwhile
+    resp = open_file_stream(session_token, url, hold_slot=False)
+    # The body is relayed still encoded, so the upstream length/encoding stay accurate
+    headers = [("Content-Type", resp.headers.get("Content-Type", "application/octet-stream"))]
+    encoding = resp.headers.get("Content-Encoding")
+    if encoding:
+        headers.append(("Content-Encoding", encoding))
+    length = resp.headers.get("Content-Length")
+    expected_size = int(length) if length and length.isdigit() else None
+    size_headers = [("Content-Length", length)] if expected_size is not None else []
+    start_response("200 OK", headers + size_headers + [("Content-Disposition", disposition)])
+    # Only a direct 200 for the exact URL is shared with other users
+    cacheable = resp.status_code == 200 and resp.url == url
+    if not cacheable:
+        expected_size = None
+    return _cache_as_you_go(iter_file_chunks(resp), url, headers, expected_size)
+
+
+JSON_ROUTES = [
+    ("POST", re.compile(r"^/api/login$"), login),
+    ("POST", re.compile(r"^/api/logout$"), logout),
+    ("GET", re.compile(r"^/api/semesters$"), semesters),
+    ("GET", re.compile(r"^/api/subjects/(\d+)/documents$"), subject_documents),
+    ("GET", re.compile(r"^/api/resource$"), resource),
+    ("GET", re.compile(r"^/api/attendance$"), attendance),
+    ("GET", re.compile(r"^/api/status$"), status),
+]
+
+
+def app(environ, start_response):
+    """
+    WSGI entry point. Serve with any WSGI server, e.g. `gunicorn -w 1 --threads 32 api:app`,
+    or run this file directly for the bundled threaded server.
+    """
+    method = environ.get("REQUEST_METHOD", "GET")
+    path = environ.get("PATH_INFO", "")
+    try:
+        if path == "/api/file":
+            if method != "GET":
+                raise ApiError("405 Method Not Allowed", "Use GET.")
+            return file_download(environ, start_response)
+        for route_method, pattern, handler in JSON_ROUTES:
+            match = pattern.match(path)
+            if not match:
+                continue
+            if method != route_method:
+                raise ApiError("405 Method Not Allowed", f"Use {route_method}.")
+            return _json_response(start_response, "200 OK", handler(environ, *match.groups()))
+        raise ApiError("404 Not Found", "Unknown endpoint.")
+    except ApiError as e:
+        return _json_response(start_response, e.status, {"error": e.message})
+    except SessionExpiredError as e:
+        # The LMS dropped this user's session; forget it so the client logs in again
+        token = _api_token(environ)
+        if token:
+            sessions.remove(token)
+        return _json_response(start_response, "401 Unauthorized", {"error": str(e)})
+    except FileRedirectError as e:
+        return _json_response(start_response, "502 Bad Gateway", {"error": str(e)})
+    except GovernorBusyError as e:
+        return _json_response(start_response, "503 Service Unavailable", {"error": str(e)},
+                              headers=[("Retry-After", str(e.retry_after))])
+    except requests.HTTPError as e:
+        status = PASSTHROUGH_STATUSES.get(getattr(e.response, "status_code", None))
+        if status:
+            return _json_response(start_response, status, {"error": f"LMS refused: {e}"})
+        return _json_response(start_response, "502 Bad Gateway", {"error": f"LMS error: {e}"})
+    except requests.RequestException as e:
+        return _json_response(start_response, "504 Gateway Timeout", {"error": f"LMS unreachable: {e}"})
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+if __name__ == "__main__":
+    host = os.environ.get("API_HOST", "127.0.0.1")
+    port = int(os.environ.get("API_PORT", "8000"))
+    with make_server(host, port, app, server_class=ThreadingWSGIServer) as server:
+        print(f"Serving LMS API on http://{host}:{port}")
+        server.serve_forever()
@@ -1,4 +1,4 @@
-import requests
+from core.auth import create_retry_session
 import re
 from bs4 import BeautifulSoup
 
@@ -13,8 +13,7 @@ def fetch_detailed_attendance(session_token):
     headers = {
         "Cookie": "session_token"
     }
-    session = requests.Session()
-    session.cookies.set("MoodleSession", session_token)
+    session = create_retry_session(session_token)
     resp = session.get(url, timeout=10)
     resp.raise_for_status()
     # print(resp.text)
@@ -51,8 +50,7 @@ def fetch_overall_attendance(session_token):
     headers = {
         "Cookie": "session_token"
     }
-    session = requests.Session()
-    session.cookies.set("MoodleSession", session_token)
+    session = create_retry_session(session_token)
     resp = session.get(url, timeout=10)
     resp.raise_for_status()
     soup = BeautifulSoup(resp.text, "html.parser")
@@ -1,18 +1,39 @@
+import threading
 import requests
 from bs4 import BeautifulSoup
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-def create_retry_session():
-    retry_strategy = Retry(
-        total=3,
-        backoff_factor=1,
-        status_forcelist=[502, 503, 504, 408],
-        allowed_methods=["GET", "POST"],
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
+from core.governor import GovernedAdapter, governor, LOGIN_PATH
+class SessionExpiredError(RuntimeError):
+    pass
+def _raise_on_login_redirect(resp, *args, **kwargs):
+    # The LMS answers any request with an expired MoodleSession by bouncing to the login page
+    location = resp.headers.get("Location", "") if resp.is_redirect else ""
+    if LOGIN_PATH in location or LOGIN_PATH in resp.url:
+        resp.close()
+        raise SessionExpiredError("Session expired. Please log in again.")
+class _SharedAdapter(GovernedAdapter):
+    def close(self):
+        # Every session mounts this one adapter, so Session.close() (or `with
+        # create_retry_session()`) must not tear down the pool all users share
+        pass
+_shared_adapter = None
+_adapter_lock = threading.Lock()
+def _get_shared_adapter():
+    # One adapter (and so one connection pool) for every session in the process
+    global _shared_adapter
+    with _adapter_lock:
+        if _shared_adapter is None:
+            # Retries (502/408, connection errors, timeouts) are done per attempt by the
+            # adapter; 429/503/504 and Retry-After are paced by the governor
+            _shared_adapter = _SharedAdapter(pool_maxsize=governor.max_limit)
+        return _shared_adapter
+def create_retry_session(session_token=None):
+    adapter = _get_shared_adapter()
     session = requests.Session()
     session.mount("https://", adapter)
     session.mount("http://", adapter)
+    if session_token:
+        session.cookies.set("MoodleSession", session_token)
+        session.hooks["response"].append(_raise_on_login_redirect)
     return session
 def _fetch_login_token(session, login_url):
     res = session.get(login_url, timeout=10)
@@ -0,0 +1,51 @@
+import threading
+from collections import OrderedDict
+
+
+class FileCache:
+    """
+    Thread-safe LRU cache of file bodies, bounded by total size in bytes.
+    Entries are (headers, body) keyed by file URL and shared by all users;
+    headers is a list of (name, value) pairs describing body as stored.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_item_bytes=8 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item
+
+    def put(self, key, headers, body):
+        if len(body) > self.max_item_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= len(old[1])
+            self._items[key] = (list(headers), body)
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "bytes": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
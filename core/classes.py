@@ -1,4 +1,4 @@
-import requests
+from core.auth import create_retry_session
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse, parse_qs
 
@@ -25,8 +25,7 @@ def extract_module_type(href):
 
 def fetch_class_html(session_token, class_id):
     url = CLASS_PAGE_URL.format(class_id=class_id)
-    session = requests.Session()
-    session.cookies.set("MoodleSession", session_token)
+    session = create_retry_session(session_token)
     resp = session.get(url, timeout=10)
     resp.raise_for_status()
     return resp.text
@@ -1,6 +1,9 @@
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse, parse_qs
 import re
+from core.auth import create_retry_session
+
+DASHBOARD_URL = "https://mydy.dypatil.edu/rait/my"
 
 def extract_id_from_href(href):
     parsed_url = urlparse(href)
@@ -56,4 +59,12 @@ def parse_semesters_and_subjects(html: str):
 
     return semesters
 
+def fetch_dashboard_html(session_token):
+    session = create_retry_session(session_token)
+    resp = session.get(DASHBOARD_URL, timeout=10)
+    resp.raise_for_status()
+    return resp.text
 
+def get_semesters(session_token):
+    html = fetch_dashboard_html(session_token)
+    return parse_semesters_and_subjects(html)
@@ -1,4 +1,4 @@
-import requests
+from core.auth import create_retry_session
 import re
 from bs4 import BeautifulSoup
 
@@ -6,8 +6,7 @@ DOC_URL = "https://mydy.dypatil.edu/rait/mod/{mod_type}/view.php?id={doc_id}"
 
 def fetch_document_html(session_token, mod_type, doc_id):
     url = DOC_URL.format(mod_type=mod_type, doc_id=doc_id)
-    session = requests.Session()
-    session.cookies.set("MoodleSession", session_token)
+    session = create_retry_session(session_token)
     resp = session.get(url, timeout=10)
     resp.raise_for_status()
     return resp.text
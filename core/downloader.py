@@ -1,7 +1,15 @@
-import requests
-from urllib.parse import unquote, urlparse
+from core.auth import create_retry_session
+from core.governor import release_slot_early
+from urllib.parse import unquote, urlparse, urljoin
 import os
 
+LMS_HOST = "mydy.dypatil.edu"
+CHUNK_SIZE = 64 * 1024
+MAX_FILE_REDIRECTS = 5
+
+class FileRedirectError(RuntimeError):
+    pass
+
 def get_filename_from_url(file_url):
     """
     Extracts a clean filename from the end of a URL.
@@ -15,12 +23,72 @@ def download_file_as_bytes(session_token, file_url):
     Fetches a file from a URL protected by MoodleSession.
     Returns file bytes (to use with Streamlit's download_button).
     """
-    session = requests.Session()
-    session.cookies.set("MoodleSession", session_token)
+    session = create_retry_session(session_token)
     with session.get(file_url, stream=True, timeout=30) as resp:
         resp.raise_for_status()
         return resp.content  # File as bytes
 
+def is_lms_file_url(file_url):
+    """
+    True for pluginfile.php URLs on the LMS host (the only files we proxy).
+    """
+    parsed = urlparse(file_url)
+    return (
+        parsed.scheme == "https"
+        and parsed.hostname == LMS_HOST
+        and "/pluginfile.php/" in parsed.path
+    )
+
+def open_file_stream(session_token, file_url, hold_slot=True):
+    """
+    Opens a streamed response for a MoodleSession-protected file.
+    A redirect to the login page raises SessionExpiredError; other redirects are
+    only followed while they stay on LMS pluginfile.php URLs.
+    With hold_slot=False the governor slot is freed once headers arrive, for
+    bodies relayed at a client's pace rather than the LMS's.
+    Caller must close it (or use it as a context manager).
+    """
+    session = create_retry_session(session_token)
+    url = file_url
+    for _ in range(MAX_FILE_REDIRECTS + 1):
+        resp = session.get(url, stream=True, timeout=30, allow_redirects=False)
+        if not resp.is_redirect:
+            break
+        resp.close()
+        url = urljoin(url, resp.headers["Location"])
+        if not is_lms_file_url(url):
+            raise FileRedirectError(f"LMS redirected the file to an unsupported location: {url}")
+    else:
+        raise FileRedirectError("Too many redirects for this file.")
+    try:
+        resp.raise_for_status()
+    except Exception:
+        resp.close()
+        raise
+    if not hold_slot:
+        release_slot_early(resp)
+    return resp
+
+def iter_file_chunks(resp, chunk_size=CHUNK_SIZE):
+    """
+    Yields the body of a response opened by open_file_stream and closes it when done.
+    The body is passed through as sent (not gzip-decoded), so it matches the
+    upstream Content-Length and Content-Encoding.
+    """
+    with resp:
+        for chunk in resp.raw.stream(chunk_size, decode_content=False):
+            if chunk:
+                yield chunk
+
+def can_access_file(session_token, file_url):
+    """
+    Cheap access check (HEAD, no body) so shared cached copies are only
+    served to users the LMS would serve them to.
+    """
+    session = create_retry_session(session_token)
+    resp = session.head(file_url, allow_redirects=False, timeout=10)
+    return resp.status_code == 200
+
 # ---- Example usage for plain Python testing (saves locally) ----
 if __name__ == "__main__":
     token = input("Session token: ").strip()
@@ -0,0 +1,305 @@
+import math
+import threading
+import time
+import weakref
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import exceptions as urllib3_exceptions
+
+class GovernorBusyError(requests.exceptions.RequestException):
+    """
+    No slot freed up within the governor's acquire_timeout.
+    """
+
+    def __init__(self, retry_after, *args, **kwargs):
+        super().__init__(f"LMS is busy, retry in {retry_after}s", *args, **kwargs)
+        self.retry_after = retry_after
+
+
+# Responses that mean the LMS wants us to slow down
+BACKOFF_STATUSES = (429, 503, 504)
+LOGIN_PATH = "/login/index.php"
+
+
+def parse_retry_after(value):
+    """
+    Returns the number of seconds a Retry-After header asks us to wait, or None.
+    Accepts both the delta-seconds and HTTP-date forms.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class ConcurrencyGovernor:
+    """
+    AIMD limit on the number of in-flight requests to the LMS.
+
+    The limit grows by roughly one slot per round of healthy responses, but only
+    while the limit is actually in use, latency stays near its floor and the recent
+    5xx/connection error rate is below error_threshold. It is halved on
+    429/503/504, timeouts or a high error rate. A cut is applied at most once per
+    cooldown so one burst of errors counts once.
+
+    acquire_timeout (seconds, None to wait forever) bounds how long a caller
+    queues for a slot before GovernorBusyError is raised.
+    """
+
+    def __init__(self, initial_limit=2, min_limit=1, max_limit=16,
+                 decrease_factor=0.5, latency_tolerance=2.0, cooldown=2.0,
+                 max_retry_after=120.0, error_threshold=0.1, acquire_timeout=None):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.cooldown = cooldown
+        self.max_retry_after = max_retry_after
+        self.error_threshold = error_threshold
+        self.acquire_timeout = acquire_timeout
+
+        self._cond = threading.Condition()
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._latency_ewma = None
+        self._latency_floor = None
+        self._error_rate = 0.0
+        self._stats = {"requests": 0, "successes": 0, "backoffs": 0, "errors": 0, "neutral": 0, "busy": 0}
+        self._last_signal = None
+
+    def acquire(self):
+        deadline = None
+        if self.acquire_timeout is not None:
+            deadline = time.monotonic() + self.acquire_timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wait = self._blocked_until - now
+                if wait <= 0 and self._in_flight < int(self._limit):
+                    break
+                if deadline is not None:
+                    if now >= deadline:
+                        self._stats["busy"] += 1
+                        raise GovernorBusyError(max(1, math.ceil(wait)))
+                    wait = min(wait, deadline - now) if wait > 0 else deadline - now
+                self._cond.wait(timeout=wait if wait > 0 else None)
+            self._in_flight += 1
+            self._stats["requests"] += 1
+
+    def release(self, outcome, latency=None, retry_after=None):
+        """
+        outcome is "ok", "backoff" (server pushed back), "error" (5xx or connection
+        failure) or "neutral" (says nothing about server load, e.g. an expired login).
+        latency is the time to response headers, not the body transfer.
+        """
+        with self._cond:
+            # Only grow when every slot was busy: the others in flight (not counting
+            # the request that just finished) were using all but this one
+            saturated = self._in_flight - 1 >= int(self._limit) - 1
+            self._in_flight -= 1
+            now = time.monotonic()
+            if outcome != "neutral":
+                failed = 1.0 if outcome == "error" else 0.0
+                self._error_rate = 0.9 * self._error_rate + 0.1 * failed
+            if outcome == "ok":
+                self._stats["successes"] += 1
+                healthy = latency is None or self._record_latency(latency)
+                if healthy and saturated and self._error_rate <= self.error_threshold:
+                    self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+            elif outcome == "backoff":
+                self._stats["backoffs"] += 1
+                self._decrease(now)
+                if retry_after:
+                    retry_after = min(retry_after, self.max_retry_after)
+                    self._blocked_until = max(self._blocked_until, now + retry_after)
+            elif outcome == "error":
+                self._stats["errors"] += 1
+                if self._error_rate > self.error_threshold:
+                    self._last_signal = "error rate"
+                    self._decrease(now)
+            else:
+                self._stats["neutral"] += 1
+            self._cond.notify_all()
+
+    def _decrease(self, now):
+        if now - self._last_decrease >= self.cooldown:
+            self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+            self._last_decrease = now
+
+    def _record_latency(self, latency):
+        # Returns True when latency is close enough to the best seen to keep growing
+        if self._latency_ewma is None:
+            self._latency_ewma = latency
+        else:
+            self._latency_ewma = 0.8 * self._latency_ewma + 0.2 * latency
+        if self._latency_floor is None or latency < self._latency_floor:
+            self._latency_floor = latency
+        else:
+            # Let the floor drift up slowly so one lucky response doesn't stall growth
+            self._latency_floor += 0.01 * (self._latency_ewma - self._latency_floor)
+        return self._latency_ewma <= self._latency_floor * self.latency_tolerance
+
+    def note_signal(self, signal):
+        with self._cond:
+            self._last_signal = signal
+
+    def snapshot(self):
+        """
+        Current governor state as a plain dict, for monitoring.
+        """
+        with self._cond:
+            return {
+                "limit": round(self._limit, 2),
+                "in_flight": self._in_flight,
+                "blocked_for": round(max(0.0, self._blocked_until - time.monotonic()), 2),
+                "latency_ewma": self._latency_ewma,
+                "latency_floor": self._latency_floor,
+                "error_rate": round(self._error_rate, 3),
+                "last_signal": self._last_signal,
+                **self._stats,
+            }
+
+
+# One governor for the whole process, so every session shares the same budget
+governor = ConcurrencyGovernor()
+
+
+def get_governor_state():
+    return governor.snapshot()
+
+
+class GovernedAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that routes every request attempt through the shared governor.
+
+    Retries happen here rather than inside urllib3, so each attempt takes its own
+    slot and the backoff sleeps are spent without holding one. The slot is held
+    until the response body has been read or the response is closed, so streamed
+    downloads count against the in-flight limit too.
+    """
+
+    def __init__(self, *args, governor=governor, retries=3, backoff_factor=1,
+                 retry_statuses=(502, 408), retry_methods=("GET", "POST"), **kwargs):
+        self.governor = governor
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.retry_statuses = retry_statuses
+        self.retry_methods = retry_methods
+        # urllib3 must not retry on its own, or its attempts would share one slot
+        kwargs["max_retries"] = 0
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        attempt = 0
+        while True:
+            can_retry = attempt < self.retries and request.method in self.retry_methods
+            try:
+                resp = self._send_once(request, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if not can_retry:
+                    raise
+            else:
+                if not (can_retry and resp.status_code in self.retry_statuses):
+                    return resp
+                resp.close()
+            if attempt:
+                time.sleep(self.backoff_factor * 2 ** attempt)
+            attempt += 1
+
+    def _send_once(self, request, **kwargs):
+        self.governor.acquire()
+        started = time.monotonic()
+        try:
+            resp = super().send(request, **kwargs)
+        except Exception as e:
+            if is_timeout(e):
+                self.governor.note_signal("timeout")
+                self.governor.release("backoff")
+            else:
+                self.governor.release("error")
+            raise
+        latency = time.monotonic() - started
+        outcome, retry_after = classify_response(resp)
+        if outcome == "backoff":
+            self.governor.note_signal(f"HTTP {resp.status_code}")
+        self._release_with_body(resp, outcome, latency, retry_after)
+        return resp
+
+    def _release_with_body(self, resp, outcome, latency, retry_after):
+        lock = threading.Lock()
+        released = []
+        gov = self.governor
+
+        def release():
+            # release_conn and the finalizer can both fire; only the first one counts
+            with lock:
+                if released:
+                    return
+                released.append(True)
+            gov.release(outcome, latency, retry_after)
+
+        raw = resp.raw
+        original_release_conn = raw.release_conn
+
+        def release_conn():
+            try:
+                original_release_conn()
+            finally:
+                release()
+
+        # urllib3 calls release_conn once the body is exhausted; requests calls it on close()
+        raw.release_conn = release_conn
+        resp.governor_release = release
+        # Safety net for responses that are dropped without being read or closed
+        weakref.finalize(resp, release)
+
+
+def release_slot_early(resp):
+    """
+    Frees the governor slot of a streamed response before its body is read.
+    For bodies relayed at someone else's pace (e.g. an API client's download).
+    """
+    release = getattr(resp, "governor_release", None)
+    if release:
+        release()
+
+
+def is_timeout(exc):
+    """
+    True for connect/read timeouts, including the ones requests wraps in a
+    ConnectionError (a MaxRetryError whose reason is a ReadTimeoutError).
+    """
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if isinstance(exc, (requests.exceptions.Timeout, urllib3_exceptions.TimeoutError)):
+            return True
+        if isinstance(getattr(exc, "reason", None), urllib3_exceptions.TimeoutError):
+            return True
+        if exc.args and isinstance(exc.args[0], BaseException):
+            inner = exc.args[0]
+            if isinstance(inner, urllib3_exceptions.TimeoutError) or isinstance(
+                    getattr(inner, "reason", None), urllib3_exceptions.TimeoutError):
+                return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+def classify_response(resp):
+    if resp.status_code in BACKOFF_STATUSES:
+        return "backoff", parse_retry_after(resp.headers.get("Retry-After"))
+    if resp.is_redirect and LOGIN_PATH in resp.headers.get("Location", ""):
+        # An expired session is a per-user problem, not a sign of server load
+        return "neutral", None
+    if resp.status_code >= 500:
+        return "error", None
+    return "ok", None
@@ -4,12 +4,13 @@ import zipfile
 import streamlit as st
 from pages.content import content
 from pages.attendance import attendance
-from core.auth import login_and_get_session_token
+from core.auth import login_and_get_session_token, SessionExpiredError
 from core.dashboard import parse_semesters_and_subjects
 from core.classes import get_class_documents
 from core.doc import get_document_resource
 from core.downloader import download_file_as_bytes, get_filename_from_url
 from core.attendance import fetch_detailed_attendance, fetch_overall_attendance
+from core.governor import get_governor_state
 
 DATA_DIR = "data"
 SESSION_ENV = os.path.join(DATA_DIR, ".env")
@@ -32,7 +33,11 @@ def remove_token():
         os.remove(SESSION_ENV)
         
 session_token = load_token()
-overall_attendance = fetch_overall_attendance(session_token)
+try:
+    overall_attendance = fetch_overall_attendance(session_token)
+except SessionExpiredError:
+    # The pages show the login form and clear the stale token
+    overall_attendance = None
 # Define pages
 pages = {
     "Main Pages": [
@@ -42,3 +47,6 @@ pages = {
 }
 pg = st.navigation(pages, position="top", expanded=True)
 pg.run()
+
+with st.sidebar.expander("LMS traffic"):
+    st.json(get_governor_state())
@@ -2,7 +2,7 @@ import os
 import io
 import zipfile
 import streamlit as st
-from core.auth import login_and_get_session_token
+from core.auth import login_and_get_session_token, SessionExpiredError
 from core.dashboard import parse_semesters_and_subjects
 from core.classes import get_class_documents
 from core.doc import get_document_resource
@@ -11,7 +11,6 @@ from core.attendance import fetch_detailed_attendance, fetch_overall_attendance
 
 DATA_DIR = "data"
 SESSION_ENV = os.path.join(DATA_DIR, ".env")
-DASHBOARD_URL = "https://mydy.dypatil.edu/rait/my"
 LOGIN_URL = "https://mydy.dypatil.edu/rait/login/index.php"
 
 def save_token(token):
@@ -29,14 +28,6 @@ def remove_token():
     if os.path.exists(SESSION_ENV):
         os.remove(SESSION_ENV)
 
-def fetch_dashboard_html(session_token):
-    import requests
-    session = requests.Session()
-    session.cookies.set("MoodleSession", session_token)
-    resp = session.get(DASHBOARD_URL, timeout=10)
-    resp.raise_for_status()
-    return resp.text
-
 def attendance():
     st.title("LMS Attendance")
 
@@ -71,7 +62,14 @@ def attendance():
     
     
     
-    data = fetch_detailed_attendance(session_token)
+    try:
+        data = fetch_detailed_attendance(session_token)
+    except SessionExpiredError:
+        st.error("Session expired. Please login again.")
+        remove_token()
+        st.session_state.logged_in = False
+        st.rerun()
+        return
 
     # Display as simple HTML table
     html = "<table><tr>"
@@ -1,16 +1,17 @@
 import os
 import io
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 from core.auth import login_and_get_session_token
-from core.dashboard import parse_semesters_and_subjects
+from core.dashboard import parse_semesters_and_subjects, fetch_dashboard_html
 from core.classes import get_class_documents
 from core.doc import get_document_resource
 from core.downloader import download_file_as_bytes, get_filename_from_url
+from core.governor import governor
 
 DATA_DIR = "data"
 SESSION_ENV = os.path.join(DATA_DIR, ".env")
-DASHBOARD_URL = "https://mydy.dypatil.edu/rait/my"
 LOGIN_URL = "https://mydy.dypatil.edu/rait/login/index.php"
 
 def save_token(token):
@@ -28,13 +29,11 @@ def remove_token():
     if os.path.exists(SESSION_ENV):
         os.remove(SESSION_ENV)
 
-def fetch_dashboard_html(session_token):
-    import requests
-    session = requests.Session()
-    session.cookies.set("MoodleSession", session_token)
-    resp = session.get(DASHBOARD_URL, timeout=10)
-    resp.raise_for_status()
-    return resp.text
+def fetch_doc_file(session_token, doc):
+    file_url = get_document_resource(session_token, doc["module_type"], doc["id"])
+    if not file_url:
+        return None
+    return get_filename_from_url(file_url), download_file_as_bytes(session_token, file_url)
 
 def content():
     st.title("LMS Dashboard")
@@ -162,18 +161,21 @@ def content():
         with st.spinner("Preparing ZIP file..."):
             zip_buffer = io.BytesIO()
             added = 0
-            with zipfile.ZipFile(zip_buffer, "w", compression=zipfile.ZIP_DEFLATED) as zipf:
-                for doc in display_docs:
-                    if doc['module_type'] in DOWNLOADABLE_TYPES:
-                        file_url = get_document_resource(session_token, doc["module_type"], doc["id"])
-                        if file_url:
-                            try:
-                                file_bytes = download_file_as_bytes(session_token, file_url)
-                                filename = get_filename_from_url(file_url)
-                                zipf.writestr(filename, file_bytes)
-                                added += 1
-                            except Exception as e:
-                                st.warning(f"Failed to add file: {filename}: {e}")
+            downloadable = [d for d in display_docs if d['module_type'] in DOWNLOADABLE_TYPES]
+            # Fetch in parallel; the governor decides how many requests actually run at once
+            with ThreadPoolExecutor(max_workers=governor.max_limit) as pool, \
+                    zipfile.ZipFile(zip_buffer, "w", compression=zipfile.ZIP_DEFLATED) as zipf:
+                futures = [pool.submit(fetch_doc_file, session_token, doc) for doc in downloadable]
+                for doc, future in zip(downloadable, futures):
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        st.warning(f"Failed to add file: {doc['type']}: {e}")
+                        continue
+                    if result:
+                        filename, file_bytes = result
+                        zipf.writestr(filename, file_bytes)
+                        added += 1
             zip_buffer.seek(0)
             if added:
                 st.success(f"Prepared {added} files in ZIP archive.")